@@ -0,0 +1,999 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from nexus_pipeline import (
+    JSON_DECODERS,
+    CSVAdapter,
+    FairScheduler,
+    JSONAdapter,
+    NexusManager,
+    PipelineGraph,
+    ProcessingPipeline,
+    StreamAdapter,
+)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+PipelineFactory = Callable[[str], ProcessingPipeline]
+
+
+def make_json_records(n: int) -> List[str]:
+    """_summary_
+    ベンチマーク用の JSON 文字列レコードを生成する。
+
+    Args:
+        n (int): 生成する件数。
+
+    Returns:
+        List[str]: JSON 文字列のリスト。
+    """
+    return [
+        json.dumps({"sensor": "temp", "value": 15.0 + (i % 20), "unit": "C"})
+        for i in range(n)
+    ]
+
+
+def make_csv_records(n: int) -> List[str]:
+    """_summary_
+    ベンチマーク用の CSV レコード（ヘッダ行 + 1行の本文）を生成する。
+
+    Args:
+        n (int): 生成する件数。
+
+    Returns:
+        List[str]: CSV テキストのリスト。
+    """
+    return [f"user,action,timestamp\nuser{i},login,{i}" for i in range(n)]
+
+
+def make_stream_records(n: int) -> List[List[Any]]:
+    """_summary_
+    ベンチマーク用の温度パケットリスト（小さなストリームバッチ）を生成する。
+
+    Args:
+        n (int): 生成する件数。
+
+    Returns:
+        List[List[Any]]: 温度パケットのリストのリスト。
+    """
+    return [[{"temp": 20.0 + (i % 5)}, {"temp": 22.5}] for i in range(n)]
+
+
+def time_call(fn: Callable[[], Any]) -> float:
+    """_summary_
+    関数を1回実行し、経過時間（秒）を返す。
+
+    Args:
+        fn (Callable[[], Any]): 計測する関数。
+
+    Returns:
+        float: 経過時間（秒）。
+    """
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def best_of(fn: Callable[[], Any], repeat: int = 3) -> float:
+    """_summary_
+    関数を repeat 回実行し、最も短い経過時間（秒）を返す。
+
+    Args:
+        fn (Callable[[], Any]): 計測する関数。
+        repeat (int): 実行回数。
+
+    Returns:
+        float: 最短の経過時間（秒）。
+    """
+    return min(time_call(fn) for _ in range(repeat))
+
+
+BATCH_TARGET_SPEEDUP = 5.0
+
+
+def bench_batch(n: int, repeat: int = 5) -> int:
+    """_summary_
+    1件処理（process）とバッチ処理（process_many）のスループットを比較する。
+
+    各アダプタについて、同じ入力を別々のパイプラインで処理する。
+    1件処理とバッチ処理を交互に repeat 回計測して最短時間を取り、
+    records/sec と速度比を表示する。両方の出力が一致することも確かめる。
+
+    Args:
+        n (int): 各ワークロードのレコード数。
+        repeat (int): 計測の繰り返し回数。
+
+    Returns:
+        int: 全ワークロードが BATCH_TARGET_SPEEDUP 倍以上なら 0、
+            そうでなければ 1（終了コード）。
+    """
+    workloads: List[tuple[str, PipelineFactory, List[Any]]] = [
+        ("json", JSONAdapter, make_json_records(n)),
+        ("csv", CSVAdapter, make_csv_records(n)),
+        ("stream", StreamAdapter, make_stream_records(n)),
+    ]
+    print(f"=== Batch vs single-record ({n} records) ===")
+    missed = []
+    for name, factory, records in workloads:
+        single = factory(f"BENCH_{name.upper()}_SINGLE")
+        batch = factory(f"BENCH_{name.upper()}_BATCH")
+        if [single.process(r) for r in records] != batch.process_many(
+            records
+        ):
+            raise AssertionError(f"{name}: batch output differs")
+        t_single = t_batch = float("inf")
+        for _ in range(repeat):
+            t_single = min(
+                t_single, time_call(lambda: [single.process(r) for r in records])
+            )
+            t_batch = min(t_batch, time_call(lambda: batch.process_many(records)))
+        speedup = t_single / t_batch
+        if speedup < BATCH_TARGET_SPEEDUP:
+            missed.append(name)
+        print(
+            f"{name:<7} single: {n / t_single:>12,.0f} rec/s  "
+            f"batch: {n / t_batch:>12,.0f} rec/s  "
+            f"speedup: {speedup:.2f}x"
+        )
+    if missed:
+        print(
+            f"below {BATCH_TARGET_SPEEDUP:.0f}x target: {', '.join(missed)}"
+        )
+        return 1
+    return 0
+
+
+def make_wide_json_records(n: int, fields: int) -> List[str]:
+    """_summary_
+    指定したフィールド数を持つ JSON 文字列レコードを生成する。
+
+    sensor/value/unit の3フィールドに、fields 個になるまで追加の
+    フィールドを足す。
+
+    Args:
+        n (int): 生成する件数。
+        fields (int): 1レコードあたりのフィールド数（3以上）。
+
+    Returns:
+        List[str]: JSON 文字列のリスト。
+    """
+    extra = {f"f{k}": k for k in range(max(fields - 3, 0))}
+    return [
+        json.dumps(
+            {"sensor": "temp", "value": 15.0 + (i % 20), "unit": "C", **extra}
+        )
+        for i in range(n)
+    ]
+
+
+def bench_instrumentation(n: int) -> None:
+    """_summary_
+    計測ポリシー（off / sampled / always）ごとの処理時間を比較する。
+
+    レコードの大きさ（フィールド数）を変えて、"off" に対する
+    オーバーヘッドを表示する。
+
+    Args:
+        n (int): 各ワークロードのレコード数。
+
+    Returns:
+        None: 何も返さない。
+    """
+    modes = [("off", 1), ("sampled", 100), ("sampled", 10), ("always", 1)]
+    print(f"=== Instrumentation overhead ({n} records) ===")
+    for fields in (3, 20, 100):
+        records = make_wide_json_records(n, fields)
+        baseline = 0.0
+        for mode, every in modes:
+            pipeline = JSONAdapter(f"BENCH_{mode.upper()}")
+            pipeline.set_instrumentation(mode, every)
+            elapsed = best_of(lambda: [pipeline.process(r) for r in records])
+            if mode == "off":
+                baseline = elapsed
+            label = mode if mode != "sampled" else f"sampled 1/{every}"
+            print(
+                f"{fields:>3} fields  {label:<14} "
+                f"{n / elapsed:>12,.0f} rec/s  "
+                f"overhead: {(elapsed / baseline - 1.0) * 100:+6.1f}%"
+            )
+
+
+def bench_tracing(n: int, repeat: int = 5) -> None:
+    """_summary_
+    トレースの標本抽出の間隔ごとに、チェイン処理（json -> csv）の時間を比較する。
+
+    設定ごとの計測を交互に repeat 回繰り返して最短時間を取り、
+    トレースなしに対するオーバーヘッドと、書き出したトレースの数を表示する。
+
+    Args:
+        n (int): レコード数。
+        repeat (int): 計測の繰り返し回数。
+
+    Returns:
+        None: 何も返さない。
+    """
+    records = make_json_records(n)
+    print(f"=== Tracing overhead, chain json -> csv ({n} records) ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        managers: List[Tuple[int, NexusManager]] = []
+        for every in (0, 1000, 100, 1):
+            manager = NexusManager()
+            manager.add_pipeline("json", JSONAdapter("BENCH_PARSE"))
+            manager.add_pipeline("csv", CSVAdapter("BENCH_STORE"))
+            if every:
+                manager.enable_tracing(
+                    os.path.join(tmp, f"spans_{every}.ndjson"), every
+                )
+            managers.append((every, manager))
+
+        best: Dict[int, float] = {}
+        for _ in range(repeat):
+            for every, manager in managers:
+                elapsed = time_call(
+                    lambda: [
+                        manager.chain(["json", "csv"], r) for r in records
+                    ]
+                )
+                best[every] = min(best.get(every, elapsed), elapsed)
+
+        for every, manager in managers:
+            tracer = manager.tracer
+            manager.disable_tracing()
+            label = "off" if not every else f"sampled 1/{every}"
+            traces = 0 if tracer is None else tracer.traces
+            print(
+                f"{label:<16} {n / best[every]:>12,.0f} rec/s  "
+                f"overhead: {(best[every] / best[0] - 1.0) * 100:+6.1f}%  "
+                f"traces: {traces}"
+            )
+
+
+def bench_cache(n: int) -> None:
+    """_summary_
+    JSONAdapter の結果キャッシュの有無で処理時間を比較する。
+
+    異なるペイロードの種類数を変えて、キャッシュなしに対する速度比と
+    ヒット率を表示する。
+
+    Args:
+        n (int): 各ワークロードのレコード数。
+
+    Returns:
+        None: 何も返さない。
+    """
+    print(f"=== Result cache ({n} records) ===")
+    for distinct in (10, 1000, n):
+        records = [
+            json.dumps(
+                {"sensor": "temp", "value": 20.0, "unit": "C", "seq": i}
+            )
+            for i in range(distinct)
+        ] * (n // distinct)
+        plain = JSONAdapter("BENCH_NOCACHE")
+        cached = JSONAdapter("BENCH_CACHE")
+        cached.enable_cache(max_entries=1024)
+        t_plain = time_call(lambda: [plain.process(r) for r in records])
+        t_cached = time_call(lambda: [cached.process(r) for r in records])
+        st = cached.stats
+        hit_rate = st.cache_hits / max(st.cache_hits + st.cache_misses, 1)
+        print(
+            f"{distinct:>8} distinct  "
+            f"plain: {len(records) / t_plain:>12,.0f} rec/s  "
+            f"cached: {len(records) / t_cached:>12,.0f} rec/s  "
+            f"hit rate: {hit_rate * 100:5.1f}%  "
+            f"speedup: {t_plain / t_cached:.2f}x"
+        )
+
+
+def bench_decoder(n: int) -> None:
+    """_summary_
+    JSONAdapter の JSON デコーダごとの処理時間を比較する。
+
+    この環境で使えるデコーダ（JSON_DECODERS）それぞれについて、
+    レコードの大きさ（フィールド数）を変えて "stdlib" との速度比を表示する。
+
+    Args:
+        n (int): 各ワークロードのレコード数。
+
+    Returns:
+        None: 何も返さない。
+    """
+    names = ["stdlib"] + sorted(set(JSON_DECODERS) - {"stdlib"})
+    print(f"=== JSON decoder backends ({n} records) ===")
+    for fields in (3, 20, 100):
+        records = [r.encode() for r in make_wide_json_records(n, fields)]
+        baseline = 0.0
+        for name in names:
+            pipeline = JSONAdapter(f"BENCH_{name.upper()}", decoder=name)
+            pipeline.set_instrumentation("off")
+            elapsed = best_of(lambda: pipeline.process_many(records))
+            if name == "stdlib":
+                baseline = elapsed
+            print(
+                f"{fields:>3} fields  {name:<8} "
+                f"{n / elapsed:>12,.0f} rec/s  "
+                f"speedup: {baseline / elapsed:.2f}x"
+            )
+
+
+def bench_columnar(n: int) -> None:
+    """_summary_
+    列指向（columnar）の集計・整形の有無で処理時間を比較する。
+
+    StreamAdapter には n 件の温度パケットを1バッチとして、
+    JSONAdapter には n 件のレコードを process_many() で渡す。
+
+    Args:
+        n (int): 1バッチあたりのレコード数。
+
+    Returns:
+        None: 何も返さない。
+    """
+    packets = [{"temp": 15.0 + (i % 200) * 0.1} for i in range(n)]
+    records = make_json_records(n)
+    print(f"=== Columnar batch path ({n} records) ===")
+    for name in ("stream", "json"):
+        times = []
+        for threshold in (None, 1):
+            pipeline: Union[StreamAdapter, JSONAdapter]
+            if name == "stream":
+                pipeline = StreamAdapter("BENCH_STREAM")
+                batch: List[Any] = [packets]
+            else:
+                pipeline = JSONAdapter("BENCH_JSON")
+                batch = records
+            pipeline.set_instrumentation("off")
+            pipeline.columnar_min_batch = threshold
+            times.append(best_of(lambda: pipeline.process_many(batch)))
+        print(
+            f"{name:<7} row: {n / times[0]:>12,.0f} rec/s  "
+            f"columnar: {n / times[1]:>12,.0f} rec/s  "
+            f"speedup: {times[0] / times[1]:.2f}x"
+        )
+
+
+def bench_fair(n: int) -> None:
+    """_summary_
+    一括投入（csv）の最中に投入した警報（json）のレイテンシを比較する。
+
+    "fifo" は両パイプラインを1つの優先度クラス（共有 FIFO）に入れ、
+    "drr" は警報を重み 4 の別クラスにして FairScheduler で処理する。
+    レイテンシは警報の投入から結果が出るまでの時間。
+
+    Args:
+        n (int): 一括投入するレコード数。
+
+    Returns:
+        None: 何も返さない。
+    """
+    alert = make_json_records(1)[0]
+    bulk = make_csv_records(n)
+    print(f"=== Weighted fair scheduling ({n} bulk records) ===")
+    for label, alert_class in (("fifo", "bulk"), ("drr", "alerts")):
+        manager = NexusManager()
+        manager.add_pipeline("json", JSONAdapter("BENCH_ALERTS"))
+        manager.add_pipeline("csv", CSVAdapter("BENCH_BULK"))
+        scheduler = FairScheduler(manager)
+        scheduler.set_weight("csv", 1, "bulk")
+        scheduler.set_weight("json", 4, alert_class)
+        latencies: List[float] = []
+
+        def timer(t0: float) -> Callable[[Any], None]:
+            return lambda _: latencies.append(time.perf_counter() - t0)
+
+        with scheduler:
+            for record in bulk:
+                scheduler.submit("csv", record)
+            for _ in range(100):
+                callback = timer(time.perf_counter())
+                scheduler.submit("json", alert).add_done_callback(callback)
+                time.sleep(0.0005)
+        latencies.sort()
+        print(
+            f"{label:<5} alert p50: {latencies[49] * 1e3:>9.2f}ms  "
+            f"p99: {latencies[98] * 1e3:>9.2f}ms"
+        )
+
+
+def bench_graph(n: int) -> None:
+    """_summary_
+    1件のレコードを3つの後段に分けるとき、chain() を3回呼ぶ場合と
+    PipelineGraph で前段の結果を共有する場合の処理時間を比較する。
+
+    Args:
+        n (int): レコード数。
+
+    Returns:
+        None: 何も返さない。
+    """
+    manager = NexusManager()
+    manager.add_pipeline("json", JSONAdapter("BENCH_PARSE"))
+    manager.add_pipeline("csv", CSVAdapter("BENCH_STORE"))
+    manager.add_pipeline("stream", StreamAdapter("BENCH_AGG"))
+    graph = PipelineGraph(manager)
+    graph.add_node("parse", "json")
+    for node, pipeline in (
+        ("store", "csv"), ("aggregate", "stream"), ("alert", "stream")
+    ):
+        graph.add_node(node, pipeline)
+        graph.add_edge("parse", node)
+    branches = [["json", "csv"], ["json", "stream"], ["json", "stream"]]
+    records = make_json_records(n)
+
+    def run_chains() -> None:
+        for record in records:
+            for names in branches:
+                manager.chain(names, record)
+
+    def run_graph() -> None:
+        for record in records:
+            graph.run(record)
+
+    print(f"=== Fan-out to 3 consumers ({n} records) ===")
+    t_chain = best_of(run_chains)
+    t_graph = best_of(run_graph)
+    print(
+        f"chain x3: {n / t_chain:>12,.0f} rec/s  "
+        f"graph: {n / t_graph:>12,.0f} rec/s  "
+        f"speedup: {t_chain / t_graph:.2f}x"
+    )
+
+
+def bench_threads(
+    n: int, thread_counts: Tuple[int, ...] = (1, 8, 16, 32)
+) -> None:
+    """_summary_
+    1つの JSONAdapter を複数スレッドで同時に使い、スループットと
+    統計の正確さ（processed がレコード数と一致するか）を確かめる。
+
+    統計はスレッドごとのシャードに書かれるので、ロックを取らずに
+    正確な件数になるはず。GIL が有効なビルドではスケールしないため、
+    GIL の状態も表示する。
+
+    Args:
+        n (int): 各計測で処理するレコード数の合計。
+        thread_counts (Tuple[int, ...]): 試すスレッド数。
+
+    Returns:
+        None: 何も返さない。
+    """
+    records = make_json_records(n)
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    gil = "unknown" if is_gil_enabled is None else (
+        "enabled" if is_gil_enabled() else "disabled"
+    )
+    print(
+        f"=== Shared JSONAdapter across threads ({n} records, "
+        f"GIL {gil}, {os.cpu_count()} CPUs) ==="
+    )
+    base: Optional[float] = None
+    for count in thread_counts:
+        pipeline = JSONAdapter("BENCH_THREADS")
+        size = -(-n // count)
+        parts = [records[i:i + size] for i in range(0, n, size)]
+        barrier = threading.Barrier(len(parts) + 1)
+
+        def work(part: List[str]) -> None:
+            barrier.wait()
+            for record in part:
+                pipeline.process(record)
+
+        threads = [
+            threading.Thread(target=work, args=(part,)) for part in parts
+        ]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        rate = n / elapsed
+        base = rate if base is None else base
+        processed = pipeline.stats.processed
+        print(
+            f"{count:>3} threads: {rate:>12,.0f} rec/s  "
+            f"scaling: {rate / base:.2f}x  "
+            f"processed: {processed}"
+            f" ({'exact' if processed == n else 'MISMATCH'})"
+        )
+
+
+class SlowStage:
+    """_summary_
+    ステージを包み、レコードごとに I/O 待ち（sleep）や CPU 処理を足す
+    （bench_pipelined 用。プロセスに渡せるようモジュールの直下に置く）。
+
+    Args:
+        inner (Any): 包むステージ。
+        io_s (float): レコードあたりの待ち時間（秒）。
+        cpu_iters (int): レコードあたりの空ループの回数。
+    """
+
+    def __init__(self, inner: Any, io_s: float = 0.0, cpu_iters: int = 0):
+        self.inner = inner
+        self.io_s = io_s
+        self.cpu_iters = cpu_iters
+
+    def _work(self, count: int) -> None:
+        """_summary_
+        count 件分の待ちと CPU 処理をまとめて行う。
+
+        Args:
+            count (int): レコード数。
+
+        Returns:
+            None: 何も返さない。
+        """
+        if self.io_s:
+            time.sleep(self.io_s * count)
+        for _ in range(self.cpu_iters * count):
+            pass
+
+    def process(self, data: Any) -> Any:
+        """_summary_
+        1件分の負荷を足してから包んだステージを実行する。
+
+        Args:
+            data (Any): 入力データ。
+
+        Returns:
+            Any: 包んだステージの出力。
+        """
+        self._work(1)
+        return self.inner.process(data)
+
+    def process_batch(self, items: List[Any]) -> List[Any]:
+        """_summary_
+        バッチ分の負荷を足してから包んだステージをバッチで実行する。
+
+        Args:
+            items (List[Any]): 入力データのリスト。
+
+        Returns:
+            List[Any]: 包んだステージの出力のリスト。
+        """
+        self._work(len(items))
+        return list(self.inner.process_batch(items))
+
+
+def bench_pipelined(n: int, repeat: int = 3) -> None:
+    """_summary_
+    process_many（全ステージを1スレッドで順に実行）と process_pipelined
+    （ステージごとのワーカー）のスループットを比べる。
+
+    Transform / Output ステージに I/O 待ち、または CPU 処理の負荷を足す。
+    I/O 待ちはスレッドでも重なるが、CPU 処理が重なるのはプロセスを使い、
+    かつ CPU が複数ある場合だけなので、CPU 数と GIL の状態も表示する。
+    出力が process_many と一致するかも確かめる。
+
+    Args:
+        n (int): 処理するレコード数。
+        repeat (int): 各計測の繰り返し回数（最良値を使う）。
+
+    Returns:
+        None: 何も返さない。
+    """
+    records = make_json_records(n)
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    gil = "unknown" if is_gil_enabled is None else (
+        "enabled" if is_gil_enabled() else "disabled"
+    )
+    print(
+        f"=== Pipeline-parallel stages ({n} records, GIL {gil}, "
+        f"{os.cpu_count()} CPUs) ==="
+    )
+    loads = {"io": (2e-5, 0), "cpu": (0.0, 300)}
+    for load, (io_s, cpu_iters) in loads.items():
+        pipeline = JSONAdapter("BENCH_PIPELINED")
+        pipeline.stages = [
+            stage if index == 0 else SlowStage(stage, io_s, cpu_iters)
+            for index, stage in enumerate(pipeline.stages)
+        ]
+        expected = pipeline.process_many(records)
+        cases: Dict[str, Callable[[], List[Any]]] = {
+            "process_many": lambda: pipeline.process_many(records),
+            "pipelined thread": lambda: pipeline.process_pipelined(
+                records, backend="thread"
+            ),
+            "pipelined process": lambda: pipeline.process_pipelined(
+                records, backend="process"
+            ),
+        }
+        base: Optional[float] = None
+        print(f"--- {load}-bound stages ---")
+        for name, fn in cases.items():
+            elapsed = best_of(fn, repeat)
+            rate = n / elapsed
+            base = rate if base is None else base
+            same = fn() == expected
+            print(
+                f"{name:<18} {rate:>12,.0f} rec/s  "
+                f"speedup: {rate / base:.2f}x  "
+                f"output: {'same' if same else 'MISMATCH'}"
+            )
+
+
+SuiteWorkload = Tuple[PipelineFactory, Callable[[int], Any], Any]
+
+SUITE_WORKLOADS: Dict[str, SuiteWorkload] = {
+    "json": (
+        JSONAdapter,
+        lambda i: json.dumps(
+            {"sensor": "temp", "value": 15.0 + (i % 20), "unit": "C"}
+        ),
+        "INVALID_JSON",
+    ),
+    "csv": (
+        CSVAdapter,
+        lambda i: f"user,action,timestamp\nuser{i},login,{i}",
+        None,
+    ),
+    "stream": (
+        StreamAdapter,
+        lambda i: [{"temp": 20.0 + (i % 5)}, {"temp": 22.5}],
+        None,
+    ),
+}
+
+SUITE_CHUNK = 10_000
+SUITE_TRACE_RECORDS = 10_000
+SUITE_MIN_TIME_S = 0.5
+
+
+def iter_workload(
+    kind: str, n: int, error_rate: float, seed: int = 0
+) -> Iterator[Any]:
+    """_summary_
+    合成ワークロードのレコードを1件ずつ生成する。
+
+    error_rate の割合で、recover() を通る壊れたレコード（JSON なら
+    不正な文字列、CSV / Stream なら None）を混ぜる。seed が同じなら
+    同じ並びになる。
+
+    Args:
+        kind (str): "json" / "csv" / "stream"。
+        n (int): 生成する件数。
+        error_rate (float): 壊れたレコードの割合（0.0〜1.0）。
+        seed (int): 乱数のシード。
+
+    Returns:
+        Iterator[Any]: レコードのイテレータ。
+    """
+    _, make, bad = SUITE_WORKLOADS[kind]
+    rng = random.Random(seed)
+    for i in range(n):
+        yield bad if error_rate and rng.random() < error_rate else make(i)
+
+
+def _run_workload(
+    pipeline: ProcessingPipeline, kind: str, n: int, error_rate: float
+) -> float:
+    """_summary_
+    ワークロードを SUITE_CHUNK 件ずつ process_many() で処理する。
+
+    Args:
+        pipeline (ProcessingPipeline): 処理するパイプライン。
+        kind (str): ワークロードの種類。
+        n (int): レコード数。
+        error_rate (float): 壊れたレコードの割合。
+
+    Returns:
+        float: 処理にかかった時間（秒。レコードの生成時間は含まない）。
+    """
+    records = iter_workload(kind, n, error_rate)
+    elapsed = 0.0
+    while True:
+        chunk = list(islice(records, SUITE_CHUNK))
+        if not chunk:
+            return elapsed
+        elapsed += time_call(lambda: pipeline.process_many(chunk))
+
+
+def run_case(
+    kind: str, n: int, error_rate: float, repeat: int
+) -> Dict[str, Any]:
+    """_summary_
+    1つのケース（ワークロード・件数・エラー率）を計測する。
+
+    ピーク RSS をケースごとに測るため、新しいプロセスで実行する前提。
+
+    計測する値:
+    - rec_per_s: 計測した回のうち最速の records/sec（repeat 回、ただし
+      小さなケースは合計 SUITE_MIN_TIME_S 秒になるまで繰り返す）
+    - stage_us: ステージごとの1件あたり時間（マイクロ秒。最速の回の値）
+    - recovered: recover() を通ったレコード数（最速の回の値）
+    - gc_gen0: 最速の回で起きた第0世代 GC の回数（コンテナオブジェクトの
+      割り当て数の目安。約700件の割り当てごとに1回起きる）
+    - alloc_peak_kb: tracemalloc で測った、先頭 SUITE_TRACE_RECORDS 件を
+      処理する間のメモリ割り当てのピーク（KiB）
+    - peak_rss_mb: プロセスのピーク RSS（MiB。取得できなければ None）
+
+    Args:
+        kind (str): ワークロードの種類。
+        n (int): レコード数。
+        error_rate (float): 壊れたレコードの割合。
+        repeat (int): 計測回数。
+
+    Returns:
+        Dict[str, Any]: 計測結果。
+    """
+    factory = SUITE_WORKLOADS[kind][0]
+    best: Optional[Tuple[float, ProcessingPipeline, int]] = None
+    runs = 0
+    spent = 0.0
+    while runs < repeat or spent < SUITE_MIN_TIME_S:
+        pipeline = factory(f"BENCH_{kind.upper()}")
+        gc.collect()
+        gen0 = gc.get_stats()[0]["collections"]
+        elapsed = _run_workload(pipeline, kind, n, error_rate)
+        collections = gc.get_stats()[0]["collections"] - gen0
+        runs += 1
+        spent += elapsed
+        if best is None or elapsed < best[0]:
+            best = (elapsed, pipeline, collections)
+    assert best is not None
+    elapsed, pipeline, collections = best
+    st = pipeline.stats
+
+    traced = factory(f"BENCH_{kind.upper()}_TRACED")
+    sample = list(iter_workload(kind, min(n, SUITE_TRACE_RECORDS), error_rate))
+    tracemalloc.start()
+    traced.process_many(sample)
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    peak_rss_mb = None
+    if resource is not None:
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "rec_per_s": n / elapsed,
+        "stage_us": {
+            stage: seconds / n * 1e6
+            for stage, seconds in st.stage_timings_s.items()
+        },
+        "recovered": st.recovered,
+        "gc_gen0": collections,
+        "alloc_peak_kb": alloc_peak / 1024,
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+def find_regressions(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float,
+) -> List[str]:
+    """_summary_
+    ベースラインと比べて threshold を超えて悪化したケースを探す。
+
+    rec_per_s は下がったら、peak_rss_mb は上がったら悪化とみなす。
+    ベースラインに無いケースは比較しない。
+
+    Args:
+        results (Dict[str, Dict[str, Any]]): ケース名 -> 今回の計測結果。
+        baseline (Dict[str, Dict[str, Any]]): ケース名 -> ベースライン。
+        threshold (float): 許容する悪化の割合（例: 0.1 なら 10%）。
+
+    Returns:
+        List[str]: 悪化の説明（無ければ空リスト）。
+    """
+    problems = []
+    for case, result in results.items():
+        base = baseline.get(case)
+        if base is None:
+            continue
+        for metric, higher_is_better in (
+            ("rec_per_s", True), ("peak_rss_mb", False)
+        ):
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = new / old - 1.0
+            if (-change if higher_is_better else change) > threshold:
+                problems.append(
+                    f"REGRESSION {case} {metric}: {new:,.1f} vs baseline "
+                    f"{old:,.1f} ({change * 100:+.1f}%)"
+                )
+    return problems
+
+
+def bench_suite(
+    workloads: List[str],
+    sizes: List[int],
+    error_rates: List[float],
+    repeat: int = 3,
+    baseline_path: Optional[str] = None,
+    save_baseline: bool = False,
+    threshold: float = 0.15,
+) -> int:
+    """_summary_
+    合成ワークロードのベンチマークスイートを実行する。
+
+    ワークロード・件数・エラー率のすべての組み合わせを、ケースごとに
+    新しいプロセスで計測して表にする（run_case() 参照）。
+    baseline_path を指定すると、save_baseline なら結果をその JSON ファイルに
+    保存し、そうでなければそのファイルと比較して、threshold を超える
+    悪化があれば報告する。
+
+    Args:
+        workloads (List[str]): ワークロードの種類の一覧。
+        sizes (List[int]): レコード数の一覧。
+        error_rates (List[float]): エラー率の一覧。
+        repeat (int): ケースごとの計測回数（records/sec は最速の値）。
+        baseline_path (Optional[str]): ベースラインファイルのパス。
+        save_baseline (bool): 結果をベースラインとして保存するか。
+        threshold (float): 許容する悪化の割合。
+
+    Returns:
+        int: 終了コード（悪化があれば 1、なければ 0）。
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    print("=== Synthetic workload suite ===")
+    print(
+        f"{'case':<24} {'rec/s':>12} {'recovered':>9} {'RSS MB':>8} "
+        f"{'gen0':>6} {'alloc KB':>9}  stages (us/rec)"
+    )
+    context = multiprocessing.get_context("spawn")
+    for kind in workloads:
+        for n in sizes:
+            for error_rate in error_rates:
+                case = f"{kind}/{n}/{error_rate:g}"
+                with ProcessPoolExecutor(1, mp_context=context) as pool:
+                    result = pool.submit(
+                        run_case, kind, n, error_rate, repeat
+                    ).result()
+                results[case] = result
+                rss = result["peak_rss_mb"]
+                stages = " ".join(
+                    f"{stage}={us:.2f}"
+                    for stage, us in result["stage_us"].items()
+                )
+                print(
+                    f"{case:<24} {result['rec_per_s']:>12,.0f} "
+                    f"{result['recovered']:>9} "
+                    f"{'-' if rss is None else f'{rss:.1f}':>8} "
+                    f"{result['gc_gen0']:>6} "
+                    f"{result['alloc_peak_kb']:>9.1f}  {stages}"
+                )
+
+    if baseline_path is None:
+        return 0
+    if save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline saved: {baseline_path}")
+        return 0
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path} (use --save-baseline)")
+        return 0
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    problems = find_regressions(results, baseline, threshold)
+    for problem in problems:
+        print(problem)
+    if problems:
+        return 1
+    print(f"No regressions beyond {threshold * 100:.0f}% vs {baseline_path}")
+    return 0
+
+
+def _parse_list(text: str, convert: Callable[[str], Any]) -> List[Any]:
+    """_summary_
+    カンマ区切りの文字列をリストに変換する。
+
+    Args:
+        text (str): 例) "1e3,1e4"。
+        convert (Callable[[str], Any]): 要素ごとの変換関数。
+
+    Returns:
+        List[Any]: 変換した値のリスト。
+    """
+    return [convert(part) for part in text.split(",") if part]
+
+
+def main() -> None:
+    """_summary_
+    nexus_pipeline のベンチマークを実行するエントリポイント。
+
+    Args:
+        None: 引数なし。
+
+    Returns:
+        None: 何も返さない。
+    """
+    parser = argparse.ArgumentParser(description="nexus_pipeline benchmarks")
+    parser.add_argument(
+        "mode",
+        choices=[
+            "batch", "instrumentation", "tracing", "cache", "decoder",
+            "columnar", "fair", "graph", "threads", "pipelined", "suite",
+        ],
+        nargs="?",
+        default="batch",
+    )
+    parser.add_argument("-n", "--records", type=int, default=100_000)
+    suite = parser.add_argument_group("suite options")
+    suite.add_argument(
+        "--workloads", default=",".join(SUITE_WORKLOADS),
+        help="comma-separated workloads (default: json,csv,stream)",
+    )
+    suite.add_argument(
+        "--sizes", default="1e3,1e4,1e5",
+        help="comma-separated record counts, e.g. 1e3,1e5,1e7",
+    )
+    suite.add_argument(
+        "--error-rates", default="0,0.01,0.1",
+        help="comma-separated fractions of malformed records",
+    )
+    suite.add_argument("--repeat", type=int, default=3)
+    suite.add_argument("--baseline", help="baseline JSON file")
+    suite.add_argument(
+        "--save-baseline", action="store_true",
+        help="write results to --baseline instead of comparing",
+    )
+    suite.add_argument(
+        "--threshold", type=float, default=0.15,
+        help="allowed regression before failing (default: 0.15)",
+    )
+    args = parser.parse_args()
+
+    if args.mode == "batch":
+        sys.exit(bench_batch(args.records))
+    elif args.mode == "instrumentation":
+        bench_instrumentation(args.records)
+    elif args.mode == "tracing":
+        bench_tracing(args.records)
+    elif args.mode == "cache":
+        bench_cache(args.records)
+    elif args.mode == "decoder":
+        bench_decoder(args.records)
+    elif args.mode == "columnar":
+        bench_columnar(args.records)
+    elif args.mode == "fair":
+        bench_fair(args.records)
+    elif args.mode == "graph":
+        bench_graph(args.records)
+    elif args.mode == "threads":
+        bench_threads(args.records)
+    elif args.mode == "pipelined":
+        bench_pipelined(args.records)
+    elif args.mode == "suite":
+        workloads = _parse_list(args.workloads, str)
+        unknown = set(workloads) - set(SUITE_WORKLOADS)
+        if unknown:
+            parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+        sys.exit(
+            bench_suite(
+                workloads,
+                _parse_list(args.sizes, lambda v: int(float(v))),
+                _parse_list(args.error_rates, float),
+                repeat=args.repeat,
+                baseline_path=args.baseline,
+                save_baseline=args.save_baseline,
+                threshold=args.threshold,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,866 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import os
+import pickle
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import nexus_pipeline
+from nexus_pipeline import (
+    COLUMNAR_MIN_BATCH,
+    TEMPERATURE_SCHEMA,
+    CheckpointLog,
+    CircuitBreaker,
+    CSVAdapter,
+    DeadLetterQueue,
+    FairScheduler,
+    JSON_DECODERS,
+    InputStage,
+    JSONAdapter,
+    NexusManager,
+    OutputStage,
+    PipelineGraph,
+    PipelineStats,
+    ResultCache,
+    RollingWindow,
+    ShardedStats,
+    StreamAdapter,
+    TransformStage,
+    Tracer,
+    _column_sum,
+    _float_column,
+    _in_range_mask,
+)
+
+
+def _submit(path: Path, offset: int) -> None:
+    log = CheckpointLog(path, durable=False)
+    log.submit({"p": {"stats": {}, "state": {"n": offset}}}, offset)
+    log.close()
+
+
+def test_checkpoint_torn_tail_then_append(tmp_path: Path) -> None:
+    path = tmp_path / "ckpt.log"
+    _submit(path, 1)
+    with open(path, "ab") as f:
+        f.write(b"deadbeef {\"type\":\"sta")
+    log = CheckpointLog(path, durable=False)
+    assert log.offset == 1
+    for offset in range(2, 6):
+        log.submit({"p": {"stats": {}, "state": {"n": offset}}}, offset)
+        log.flush()
+    log.close()
+    states, offset, seq, end = CheckpointLog.load(path)
+    assert offset == 5
+    assert states["p"]["state"] == {"n": 5}
+    assert end == os.path.getsize(path)
+
+
+def test_sharded_stats_merge_while_writer_adds_keys() -> None:
+    stats = ShardedStats("p")
+    stop = threading.Event()
+
+    def writer() -> None:
+        shard = stats.local()
+        i = 0
+        while not stop.is_set():
+            key = f"k-{i % 64}"
+            shard.record_stage(key, 0.001)
+            shard.gauges[key] = float(i)
+            if i % 64 == 63:
+                shard.stage_timings_s.clear()
+                shard.stage_latency.clear()
+                shard.gauges.clear()
+            i += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(5000):
+            stats.merged()
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_sharded_stats_reset_does_not_alias_base() -> None:
+    base = PipelineStats("p", processed=3)
+    stats = ShardedStats("p")
+    stats.reset(base)
+
+    def writer() -> None:
+        stats.local().processed += 2
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    thread.join()
+    assert stats.merged().processed == 5
+    assert base.processed == 3
+
+
+def test_stats_snapshot_rejects_writes() -> None:
+    pipeline = JSONAdapter("json")
+    pipeline.process('{"sensor": "temp", "value": 22.0, "unit": "C"}')
+    stats = pipeline.stats
+    with pytest.raises(TypeError):
+        stats.processed += 5
+    with pytest.raises(TypeError):
+        stats.gauges["x"] = 1.0
+    with pytest.raises(TypeError):
+        stats.latency.record(0.001)
+    pipeline.local_stats().processed += 5
+    assert pipeline.stats.processed == 6
+    assert pickle.loads(pickle.dumps(stats)).processed == 1
+def test_pipeline_with_schema_pickles() -> None:
+    pipeline = JSONAdapter("json")
+    pipeline.set_schema(TEMPERATURE_SCHEMA)
+    clone = pickle.loads(pickle.dumps(pipeline))
+    assert "REJECTED" in str(clone.process({"sensor": "temp", "value": 99}))
+    assert clone.stats.rejected == 1
+
+
+def test_csv_quoted_header_field() -> None:
+    pipeline = CSVAdapter("csv")
+    out = pipeline.process('user,"action, kind",ts\nalice,"login, web",1')
+    assert out == "User activity logged: 1 actions processed"
+    assert pipeline.skipped_rows == 0
+
+
+def test_graph_fan_in_requires_list_input() -> None:
+    manager = NexusManager()
+    for name in ("a", "b"):
+        manager.add_pipeline(name, JSONAdapter(name))
+    manager.add_pipeline("csv", CSVAdapter("csv"))
+    manager.add_pipeline("stream", StreamAdapter("stream"))
+    graph = PipelineGraph(manager)
+    graph.add_edge("a", "csv")
+    with pytest.raises(ValueError, match="fan-in"):
+        graph.add_edge("b", "csv")
+    graph.add_edge("a", "stream")
+    graph.add_edge("b", "stream")
+    out = graph.run('{"sensor": "temp", "value": 22.0, "unit": "C"}')
+    assert out["stream"].startswith("Stream summary: 2 readings")
+
+
+def test_structured_record_is_detached_plain_dict() -> None:
+    pipeline = JSONAdapter("json")
+    data = {"sensor": "temp", "value": 22.0, "unit": "C"}
+    record = pipeline.process_structured(data)
+    data["value"] = 99
+    assert record["value"] == 22.0
+    assert json.loads(json.dumps(record))["value"] == 22.0
+
+
+def _batch_matches_single(factory: type, records: list) -> tuple:
+    single = factory("single")
+    batch = factory("batch")
+    batch.batch_chunk_size = 3
+    if hasattr(batch, "columnar_min_batch"):
+        batch.columnar_min_batch = 1
+    assert batch.process_many(records) == [single.process(r) for r in records]
+    for field in ("processed", "failed", "rejected"):
+        assert getattr(batch.stats, field) == getattr(single.stats, field)
+    return single, batch
+
+
+def test_json_batch_matches_single_record_path() -> None:
+    records = [
+        '{"sensor": "temp", "value": 22.0, "unit": "C"}',
+        '{"sensor": "temp", "value": -0.0, "unit": "C"}',
+        '{"sensor": "temp", "value": 0.0, "unit": "C"}',
+        '{"sensor": "temp", "value": 22.0, "unit": "C"}',
+        b'{"sensor": "temp", "value": 40, "unit": "C"}',
+        '{"sensor": "humidity", "value": 50, "unit": "%"}',
+        "NOT_JSON",
+        {"sensor": "temp", "value": 21.5, "unit": "C"},
+        {"sensor": "temp", "value": True, "unit": "C"},
+    ]
+    _batch_matches_single(JSONAdapter, records)
+    _batch_matches_single(JSONAdapter, records[:4])
+
+
+def test_json_batch_rejects_like_single_record_path() -> None:
+    records = [
+        '{"sensor": "temp", "value": 99, "unit": "C"}',
+        '{"sensor": "temp", "value": 22.0, "unit": "C"}',
+    ]
+    single = JSONAdapter("single")
+    batch = JSONAdapter("batch")
+    for pipeline in (single, batch):
+        pipeline.set_schema(TEMPERATURE_SCHEMA)
+    assert batch.process_many(records) == [single.process(r) for r in records]
+    assert batch.stats.rejected == single.stats.rejected == 1
+
+
+def test_csv_batch_matches_single_record_path() -> None:
+    records = [
+        "user,action,timestamp\nalice,login,1",
+        "user,action,timestamp\nbob,logout,2\ncarol,login\n\ndave,x,3",
+        "user,action,timestamp",
+        "id,note\n1,x\n2,y,z",
+        "user,action,timestamp\nalice,login,1",
+    ]
+    single, batch = _batch_matches_single(CSVAdapter, records)
+    assert batch.skipped_rows == single.skipped_rows == 2
+    columns = [p.stats.gauges["csv_columns"] for p in (single, batch)]
+    assert columns == [3.0, 3.0]
+    single, batch = _batch_matches_single(CSVAdapter, records[:4])
+    assert batch.skipped_rows == single.skipped_rows == 2
+    columns = [p.stats.gauges["csv_columns"] for p in (single, batch)]
+    assert columns == [2.0, 2.0]
+    quoted = records + ['user,action,timestamp\nalice,"a, b",1', None]
+    single, batch = _batch_matches_single(CSVAdapter, quoted)
+    assert batch.skipped_rows == single.skipped_rows
+
+
+def test_stream_batch_matches_single_record_path() -> None:
+    records = [[{"temp": 20.0 + i % 5}, {"temp": 22.5}] for i in range(10)]
+    single, batch = _batch_matches_single(StreamAdapter, records)
+    assert batch._window.values() == single._window.values()
+
+
+_TEMP = '{"sensor": "temp", "value": 22.0, "unit": "C"}'
+
+
+def _admission_manager(policy: str, capacity: int, **kwargs: object) -> Any:
+    manager = NexusManager(capacity_streams_per_sec=capacity)
+    manager.add_pipeline("json", JSONAdapter("json"))
+    manager.set_admission(policy, **kwargs)
+    return manager
+
+
+def test_admission_reject_counts_throttled() -> None:
+    manager = _admission_manager("reject", 10)
+    outs = [manager.process("json", _TEMP) for _ in range(20)]
+    refused = [o for o in outs if str(o).startswith("NexusManager REJECTED")]
+    assert 10 <= len(outs) - len(refused) <= 11
+    stats = manager._pipelines["json"].stats
+    assert stats.throttled == len(refused)
+    assert f"{len(refused)} rejected" in manager.performance_report("json")
+    assert "nexus_pipeline_throttled_total" in manager.prometheus_text()
+
+
+def test_admission_shed_returns_none_and_counts() -> None:
+    manager = _admission_manager("shed", 5)
+    outs = [manager.process("json", _TEMP) for _ in range(15)]
+    shed = outs.count(None)
+    assert shed >= 9
+    report = manager.performance_report("json")
+    assert f"{shed} shed" in report
+    assert f'nexus_pipeline_shed_total{{pipeline="json"}} {shed}' in (
+        manager.prometheus_text()
+    )
+
+
+def test_admission_block_waits_and_bounds_queue() -> None:
+    manager = _admission_manager("block", 4, burst=1, max_queue=2)
+    barrier = threading.Barrier(5)
+    outs: list = []
+
+    def call() -> None:
+        barrier.wait()
+        outs.append(manager.process("json", _TEMP))
+
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    refused = [o for o in outs if str(o).startswith("NexusManager REJECTED")]
+    assert len(refused) == 2
+    report = manager.performance_report("json")
+    assert "queue depth 0 (peak 2)" in report
+
+
+def test_admission_async_cancel_refunds_tokens() -> None:
+    manager = _admission_manager("block", 1, burst=1)
+
+    async def run() -> None:
+        await manager.process_async("json", _TEMP)
+        waiters = [
+            asyncio.create_task(manager.process_async("json", _TEMP))
+            for _ in range(5)
+        ]
+        await asyncio.sleep(0.05)
+        for task in waiters:
+            task.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+
+    asyncio.run(run())
+    assert manager._admission.bucket.tokens > -0.5
+    assert "queue depth 0" in manager.performance_report("json")
+
+
+def test_process_parallel_enforces_admission() -> None:
+    manager = _admission_manager("reject", 10)
+    records = [_TEMP] * 200
+    outs = manager.process_parallel("json", records, workers=2, chunk_size=50)
+    assert len(outs) == 200
+    refused = [o for o in outs if str(o).startswith("NexusManager REJECTED")]
+    assert 10 <= 200 - len(refused) <= 11
+    assert outs[0].startswith("Processed temperature reading")
+    stats = manager._pipelines["json"].stats
+    assert stats.processed + stats.throttled == 200
+
+
+def test_process_parallel_ships_only_the_target_pipeline(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    shipped: list = []
+    executor = nexus_pipeline.ProcessPoolExecutor
+
+    def spy(*args: Any, **kwargs: Any) -> Any:
+        shipped.append(pickle.loads(pickle.dumps(kwargs["initargs"])))
+        return executor(*args, **kwargs)
+
+    monkeypatch.setattr(nexus_pipeline, "ProcessPoolExecutor", spy)
+    manager = NexusManager()
+    manager.add_pipeline("json", JSONAdapter("json"))
+    manager.add_pipeline("csv", CSVAdapter("csv"))
+    outs = manager.process_parallel("json", [_TEMP] * 4, workers=1)
+    assert all(o.startswith("Processed temperature reading") for o in outs)
+    assert [set(args[0]) for args in shipped] == [{"json"}]
+
+
+def test_circuit_breaker_state_transitions() -> None:
+    now = [0.0]
+    breaker = CircuitBreaker(
+        failure_rate=0.5, window=4, min_calls=2, cooldown_s=10.0,
+        probe_count=2, clock=lambda: now[0],
+    )
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_primary()
+
+    now[0] = 10.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert [breaker.allow_primary() for _ in range(3)] == [True, True, False]
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    now[0] = 20.0
+    assert breaker.allow_primary() and breaker.allow_primary()
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_primary()
+
+
+def test_circuit_breaker_concurrent_record_keeps_count() -> None:
+    breaker = CircuitBreaker(failure_rate=2.0, window=50)
+    barrier = threading.Barrier(8)
+
+    def work(seed: int) -> None:
+        barrier.wait()
+        for i in range(5000):
+            breaker.record((i + seed) % 3 != 0)
+        breaker.record_many(7, 3)
+
+    threads = [threading.Thread(target=work, args=(k,)) for k in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    outcomes = list(breaker._outcomes)
+    assert len(outcomes) == 50
+    assert breaker._failures == outcomes.count(False)
+
+
+def test_recover_resumes_at_failed_stage() -> None:
+    class Counting:
+        def __init__(self) -> None:
+            self.calls = 0
+
+        def process(self, data: Any) -> Any:
+            self.calls += 1
+            return data
+
+    class FailOnce:
+        def __init__(self) -> None:
+            self.inputs: list = []
+            self.inner = TransformStage()
+
+        def process(self, data: Any) -> Any:
+            self.inputs.append(data)
+            if len(self.inputs) == 1:
+                raise RuntimeError("transient")
+            return self.inner.process(data)
+
+    pipeline = JSONAdapter("json")
+    counting, flaky = Counting(), FailOnce()
+    pipeline.stages = [counting, flaky, OutputStage()]
+    out = pipeline.process('{"sensor": "temp", "value": 22.0, "unit": "C"}')
+    assert out.startswith("Recovered JSON processing:")
+    assert "'value': 22.0" in out
+    assert counting.calls == 1
+    assert len(flaky.inputs) == 2 and flaky.inputs[0] is flaky.inputs[1]
+    stats = pipeline.stats
+    assert stats.recovered == 1 and stats.failed == 1
+
+
+def _wait_for(predicate: Any, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_buffered_writers_flush_after_interval(tmp_path: Path) -> None:
+    dlq = DeadLetterQueue(tmp_path / "dlq", 100, flush_interval_s=0.05)
+    dlq.append("p", "bad", "Error", None)
+    tracer = Tracer(tmp_path / "spans", 1, 100, flush_interval_s=0.05)
+    span = tracer.start("root")
+    assert span is not None
+    span.end()
+    assert _wait_for(lambda: len(list(DeadLetterQueue.read(dlq.path))) == 1)
+    assert _wait_for(lambda: len(list(Tracer.read(tracer.path))) == 1)
+    copy = pickle.loads(pickle.dumps(dlq))
+    copy.append("p", "again", "Error", None)
+    copy.close()
+    assert [e["payload"] for e in DeadLetterQueue.read(dlq.path)] == [
+        "bad",
+        "again",
+    ]
+
+
+def test_buffered_writers_flush_at_exit(tmp_path: Path) -> None:
+    path = tmp_path / "dlq"
+    script = (
+        "from nexus_pipeline import DeadLetterQueue\n"
+        f"q = DeadLetterQueue({str(path)!r}, batch_size=100, "
+        "flush_interval_s=3600)\n"
+        "q.append('p', 'bad', 'Error', None)\n"
+    )
+    subprocess.run(
+        [sys.executable, "-c", script],
+        check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    assert [e["payload"] for e in DeadLetterQueue.read(path)] == ["bad"]
+
+
+def test_process_ndjson_accepts_text_and_split_lines(tmp_path: Path) -> None:
+    lines = [
+        '{"sensor": "temp", "value": 22.0, "unit": "C"}',
+        '{"sensor": "temp", "value": 40, "unit": "C"}',
+        "NOT_JSON",
+        '{"sensor": "humidity", "value": 50, "note": "%s"}' % ("x" * 5000),
+    ]
+    text = "\n".join(lines) + "\n\n"
+    single = JSONAdapter("single")
+    expected = [single.process(ln.encode("utf-8")) for ln in lines]
+    path = tmp_path / "records.ndjson"
+    path.write_text(text, encoding="utf-8")
+    with open(path, encoding="utf-8") as f:
+        assert list(JSONAdapter("t").process_ndjson(f, 7)) == expected
+    assert list(JSONAdapter("s").process_ndjson(io.StringIO(text))) == expected
+    pieces = [text[i:i + 3] for i in range(0, len(text), 3)]
+    assert list(JSONAdapter("c").process_ndjson(pieces)) == expected
+    raw = text.encode("utf-8")
+    pieces_b = [raw[i:i + 3] for i in range(0, len(raw), 3)]
+    assert list(JSONAdapter("b").process_ndjson(pieces_b)) == expected
+    with pytest.raises(TypeError):
+        list(JSONAdapter("x").process_ndjson([1, 2]))
+
+
+def test_sampling_countdowns_are_per_thread(tmp_path: Path) -> None:
+    pipeline = JSONAdapter("sampled")
+    pipeline.set_instrumentation("sampled", 10)
+    tracer = Tracer(tmp_path / "spans", sample_every=1)
+    weights: list = []
+    barrier = threading.Barrier(8)
+
+    def run() -> None:
+        barrier.wait()
+        total = 0
+        for _ in range(1000):
+            total += pipeline._sample_weight()
+            tracer.start("root")
+        weights.append(total)
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert weights == [1000] * 8
+    assert tracer.traces == 8000
+    assert pickle.loads(pickle.dumps(tracer)).traces == 8000
+
+
+class _RecordingManager:
+    def __init__(self) -> None:
+        self.calls: list = []
+
+    def process(self, name: str, data: Any) -> Any:
+        self.calls.append((name, data))
+        return data
+
+
+def test_fair_scheduler_weighted_share_under_contention() -> None:
+    manager = _RecordingManager()
+    scheduler = FairScheduler(manager)  # type: ignore[arg-type]
+    scheduler.set_weight("alerts", 3.0)
+    scheduler.set_weight("bulk", 1.0)
+    for i in range(40):
+        scheduler.submit("alerts", i)
+        scheduler.submit("bulk", i)
+    assert scheduler.run_pending(limit=20) == 20
+    assert scheduler.classes["alerts"].completed == 15
+    assert scheduler.classes["bulk"].completed == 5
+    turn = ["alerts"] * 3 + ["bulk"]
+    assert [n for n, _ in manager.calls[:8]] == turn * 2
+    assert scheduler.run_pending() == 60
+    assert scheduler.pending() == 0
+
+
+def test_fair_scheduler_resets_deficit_when_queue_empties() -> None:
+    manager = _RecordingManager()
+    scheduler = FairScheduler(manager)  # type: ignore[arg-type]
+    scheduler.set_weight("alerts", 2.5)
+    scheduler.submit("alerts", "a")
+    scheduler.submit("bulk", "b")
+    scheduler.run_pending(limit=1)
+    assert scheduler._deficit["alerts"] == 0.0
+    scheduler.run_pending()
+    manager.calls.clear()
+    for i in range(4):
+        scheduler.submit("alerts", i)
+    for i in range(4):
+        scheduler.submit("bulk", i)
+    scheduler.run_pending()
+    # Without the reset, the 1.5 left over from the first turn would let
+    # alerts send 4 records in a row.
+    assert [n for n, _ in manager.calls[:3]] == ["alerts", "alerts", "bulk"]
+
+
+def test_fair_scheduler_stop_drains_queue() -> None:
+    manager = _RecordingManager()
+    scheduler = FairScheduler(manager)  # type: ignore[arg-type]
+    futures = [scheduler.submit(f"p{i % 3}", i) for i in range(50)]
+    scheduler.start(workers=2)
+    scheduler.stop()
+    assert scheduler.pending() == 0
+    assert all(f.done() for f in futures)
+    assert sorted(f.result() for f in futures) == list(range(50))
+
+
+def _assert_window_matches(
+    window: RollingWindow, expected: list, scale: float
+) -> None:
+    stats = window.stats()
+    assert stats.count == len(expected)
+    if not expected:
+        assert (stats.min_value, stats.max_value) == (None, None)
+        return
+    # Incremental updates lose a few eps * scale (eps * scale**2 for the
+    # variance) to cancellation, where scale covers the values pushed since
+    # the last resync, not only the ones still in the window.
+    tol = 1e-13 * scale
+    assert stats.total == pytest.approx(sum(expected), abs=tol * len(expected))
+    assert stats.mean == pytest.approx(statistics.fmean(expected), abs=tol)
+    variance = statistics.variance(expected) if len(expected) > 1 else 0.0
+    assert stats.variance == pytest.approx(variance, abs=tol * scale)
+    assert (stats.min_value, stats.max_value) == (min(expected), max(expected))
+
+
+def test_rolling_window_count_matches_recomputation() -> None:
+    rng = random.Random(6)
+    window = RollingWindow(max_count=7)
+    pushed: list = []
+    for _ in range(300):
+        value = rng.choice([rng.uniform(-50, 50), 1e6 + rng.random(), 3.0])
+        window.push(value)
+        pushed.append(value)
+        # _resync() runs every max(window, 64) evictions.
+        scale = max(abs(v) for v in pushed[-(64 + 7):])
+        _assert_window_matches(window, pushed[-7:], scale)
+
+
+def test_rolling_window_time_matches_recomputation() -> None:
+    rng = random.Random(7)
+    now = [0.0]
+    window = RollingWindow(max_count=None, max_age_s=5.0, clock=lambda: now[0])
+    pushed: list = []
+    for _ in range(300):
+        now[0] += rng.choice([0.1, 0.5, 2.0, 7.0])
+        value = rng.uniform(-50, 50)
+        window.push(value)
+        pushed.append((now[0], value))
+        _assert_window_matches(
+            window, [v for ts, v in pushed if ts >= now[0] - 5.0], 50.0
+        )
+    now[0] += 100.0
+    _assert_window_matches(window, [], 50.0)
+
+
+class _FailOnValue:
+    def __init__(self, modulus: int) -> None:
+        self.modulus = modulus
+
+    def process(self, data: Any) -> Any:
+        if data["value"] % self.modulus == 3:
+            raise ValueError(f"bad value {data['value']}")
+        return data
+
+
+def _pipelined_json(name: str) -> JSONAdapter:
+    pipeline = JSONAdapter(name)
+    pipeline.stages = [
+        InputStage(),
+        TransformStage(),
+        _FailOnValue(7),
+        OutputStage(),
+    ]
+    return pipeline
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_process_pipelined_matches_process_many(backend: str) -> None:
+    records = [
+        json.dumps({"sensor": "temp", "value": i, "unit": "C"})
+        for i in range(50)
+    ]
+    expected = _pipelined_json("many").process_many(records)
+    pipeline = _pipelined_json("pipelined")
+    outs = pipeline.process_pipelined(
+        records, backend=backend, micro_batch=4, replicas={1: 3, 3: 2}
+    )
+    assert outs == expected
+    failed = [i for i in range(50) if i % 7 == 3]
+    for i, out in enumerate(outs):
+        if i in failed:
+            assert out == f"JSONAdapter ERROR: ValueError: bad value {i}"
+        else:
+            assert out.startswith("Processed temperature reading")
+    stats = pipeline.stats
+    assert stats.failed == len(failed)
+    assert stats.processed == 50 - len(failed)
+    unordered = _pipelined_json("unordered").process_pipelined(
+        records, backend=backend, micro_batch=4, replicas={1: 3}, ordered=False
+    )
+    assert sorted(unordered) == sorted(expected)
+
+
+class _Gate:
+    def __init__(self) -> None:
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.running = 0
+
+    def process(self, data: Any) -> Any:
+        self.running += 1
+        self.entered.set()
+        self.release.wait(5.0)
+        self.running -= 1
+        return data
+
+
+def _gated_manager() -> tuple:
+    gate = _Gate()
+    pipeline = JSONAdapter("json")
+    pipeline.stages = [InputStage(), gate, TransformStage(), OutputStage()]
+    manager = NexusManager()
+    manager.add_pipeline("json", pipeline)
+    manager.set_concurrency("json", 1)
+    return manager, gate
+
+
+def test_chain_async_bounded_queue_applies_backpressure() -> None:
+    manager, gate = _gated_manager()
+    pulled = []
+
+    async def source() -> Any:
+        for i in range(100):
+            pulled.append(i)
+            yield _TEMP
+
+    async def run() -> list:
+        task = asyncio.create_task(
+            manager.chain_async(["json"], source(), queue_size=2)
+        )
+        await asyncio.get_running_loop().run_in_executor(
+            None, gate.entered.wait, 5.0
+        )
+        await asyncio.sleep(0.05)
+        # One record in the stage, queue_size in the inbox, one in put().
+        assert len(pulled) <= 2 + 2
+        gate.release.set()
+        return await task
+
+    outs = asyncio.run(run())
+    assert len(outs) == 100 and len(pulled) == 100
+    assert all(o.startswith("Processed temperature reading") for o in outs)
+
+
+def test_async_cancellation_waits_for_stage_and_frees_slot() -> None:
+    manager, gate = _gated_manager()
+
+    async def run() -> None:
+        loop = asyncio.get_running_loop()
+        single = asyncio.create_task(manager.process_async("json", _TEMP))
+        await loop.run_in_executor(None, gate.entered.wait, 5.0)
+        single.cancel()
+        await asyncio.sleep(0.05)
+        # Cancellation waits for the record already inside the stage.
+        assert not single.done() and gate.running == 1
+        gate.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await single
+        assert gate.running == 0
+
+        gate.release.clear()
+        gate.entered.clear()
+        chain = asyncio.create_task(
+            manager.chain_async(["json", "json"], [_TEMP] * 50, queue_size=2)
+        )
+        await loop.run_in_executor(None, gate.entered.wait, 5.0)
+        chain.cancel()
+        gate.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await chain
+        assert gate.running == 0
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+        # The concurrency slot was released: a new call goes straight through.
+        out = await asyncio.wait_for(manager.process_async("json", _TEMP), 5)
+        assert out.startswith("Processed temperature reading")
+
+    asyncio.run(run())
+
+
+def test_result_cache_lru_eviction_and_counts() -> None:
+    stats = PipelineStats(pipeline_id="cache")
+    cache = ResultCache(max_entries=2, max_bytes=100)
+    cache.put("a", "A", stats)
+    cache.put(b"b", "B", stats)
+    assert cache.get("a", stats) == "A"
+    cache.put("c", "C", stats)
+    assert cache.get(b"b", stats) is None
+    assert cache.get("a", stats) == "A" and cache.get("c", stats) == "C"
+    assert cache.get(["a"], stats) is None
+    assert (stats.cache_hits, stats.cache_misses) == (3, 1)
+    assert stats.cache_evictions == 1
+    cache.put("d" * 60, "D" * 39, stats)
+    assert len(cache) == 1 and cache.size_bytes == 99
+    assert stats.cache_evictions == 3
+    cache.put("e" * 200, "E", stats)
+    assert len(cache) == 1 and cache.get("e" * 200, stats) is None
+
+
+def test_pipeline_cache_counts_hits_and_misses() -> None:
+    pipeline = JSONAdapter("cached")
+    pipeline.enable_cache(max_entries=2)
+    payloads = [
+        json.dumps({"sensor": "temp", "value": v, "unit": "C"})
+        for v in (20, 21, 20, 22, 21, 22)
+    ]
+    outs = [pipeline.process(p) for p in payloads]
+    assert outs == [JSONAdapter("plain").process(p) for p in payloads]
+    stats = pipeline.stats
+    # 20, 21 miss; 20 hits; 22 misses and evicts 21; 21 misses and
+    # evicts 20; 22 hits.
+    assert (stats.cache_hits, stats.cache_misses) == (2, 4)
+    assert stats.cache_evictions == 2
+    assert stats.processed == 6
+
+
+_DECODER_RECORDS = [
+    '{"sensor": "temp", "value": 22.5, "unit": "C", "extra": [1, 2]}',
+    b'{"sensor": "temp", "value": 40, "unit": "c"}',
+    '{"sensor": "humidity", "value": 50, "unit": "%"}',
+    '{"value": 18}',
+    "NOT_JSON",
+    b"NOT_JSON",
+    "[1, 2]",
+    "42",
+    "",
+]
+
+
+def _without_decoder_message(out: Any) -> Any:
+    # Backends word their syntax errors differently (documented in
+    # set_decoder()); everything else must match exactly.
+    head, sep, _ = str(out).partition("JSONDecodeError: ")
+    return head + sep if sep else out
+
+
+@pytest.mark.parametrize("decoder", sorted(JSON_DECODERS))
+def test_json_decoders_agree_on_output_and_accounting(decoder: str) -> None:
+    reference = JSONAdapter("stdlib", decoder="stdlib")
+    expected = [reference.process(r) for r in _DECODER_RECORDS]
+    for batch in (False, True):
+        pipeline = JSONAdapter(decoder, decoder=decoder)
+        if batch:
+            pipeline.columnar_min_batch = 1
+            outs = pipeline.process_many(_DECODER_RECORDS)
+        else:
+            outs = [pipeline.process(r) for r in _DECODER_RECORDS]
+        assert list(map(_without_decoder_message, outs)) == list(
+            map(_without_decoder_message, expected)
+        )
+        for field in ("processed", "failed", "recovered", "rejected"):
+            got = getattr(pipeline.stats, field)
+            assert got == getattr(reference.stats, field), field
+
+
+def test_columnar_helpers_match_row_semantics() -> None:
+    values = [0.1] * 10 + [1e16, 1.0, -1e16, 15.0, 30.0, -0.0, 29.99, 7]
+    column = _float_column(values)
+    assert column is not None
+    assert _column_sum(column) == sum(values)
+    assert _column_sum(_float_column([])) == 0.0
+    assert _in_range_mask(column, 15.0, 30.0) == [
+        15.0 <= v <= 30.0 for v in values
+    ]
+    nan = _float_column([float("nan")])
+    assert _in_range_mask(nan, 15.0, 30.0) == [False]
+    assert _float_column([1.0, True]) is None
+    assert _float_column([1.0, "2"]) is None
+
+
+@pytest.mark.parametrize(
+    "size",
+    [COLUMNAR_MIN_BATCH - 1, COLUMNAR_MIN_BATCH, COLUMNAR_MIN_BATCH + 7],
+)
+def test_columnar_path_matches_row_path(size: int) -> None:
+    rng = random.Random(size)
+    temps = [
+        rng.choice([15.0, 30.0, -0.0, 14.999, 30.001, rng.uniform(0, 45)])
+        for _ in range(size)
+    ]
+    records = [
+        json.dumps({"sensor": "temp", "value": t, "unit": "C"}) for t in temps
+    ]
+    records[size // 2] = '{"sensor": "temp", "value": 21, "unit": "C"}'
+    columnar = JSONAdapter("columnar")
+    columnar.batch_chunk_size = size
+    row = JSONAdapter("row")
+    row.columnar_min_batch = None
+    assert columnar.process_many(records) == row.process_many(records)
+
+    packets = [{"temp": t} for t in temps]
+    columnar_stream = StreamAdapter("columnar")
+    row_stream = StreamAdapter("row")
+    row_stream.columnar_min_batch = None
+    for _ in range(2):
+        assert columnar_stream.process(packets) == row_stream.process(packets)
+    assert columnar_stream.process_many([packets, packets[:3]]) == (
+        row_stream.process_many([packets, packets[:3]])
+    )
+    assert columnar_stream._window.stats() == row_stream._window.stats()